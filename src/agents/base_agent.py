@@ -1,13 +1,29 @@
 """
 Base Agent class for the Agent Swarm system.
 """
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from collections import defaultdict, deque
+from typing import Dict, Any, Deque, List, Optional
+
+import orjson
+
+
+class _FieldCalls(deque):
+    """History of a tool recorded through the fast path, holding ``(key, value)`` pairs."""
+    
+    __slots__ = ()
 
 
 class BaseAgent(ABC):
     """Base class for all agents in the swarm."""
     
+    __slots__ = ("name", "tool_calls")
+    
+    # Number of results kept per tool; older results are dropped
+    TOOL_CALL_HISTORY = 128
+    
     def __init__(self, name: str):
         """Initialize the base agent.
         
@@ -15,7 +31,7 @@ class BaseAgent(ABC):
             name: The name of the agent
         """
         self.name = name
-        self.tool_calls: Dict[str, Any] = {}
+        self.tool_calls: Dict[str, Deque[Any]] = self._new_tool_calls()
     
     @abstractmethod
     async def process(self, message: str, user_id: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -38,16 +54,81 @@ class BaseAgent(ABC):
             tool_name: The name of the tool called
             tool_result: The result returned by the tool
         """
-        self.tool_calls[tool_name] = tool_result
+        calls = self.tool_calls[tool_name]
+        if type(calls) is _FieldCalls:
+            # Convert a history recorded through the fast path to plain results
+            calls = self.tool_calls[tool_name] = deque(
+                (dict((call,)) for call in calls), maxlen=self.TOOL_CALL_HISTORY
+            )
+        # Skip recording the same result twice in a row
+        if not calls or calls[-1] != tool_result:
+            calls.append(tool_result)
+    
+    def record_tool_call_fast(self, tool_name: str, key: str, value: Any) -> None:
+        """Record a single-field tool call without building its result dict.
+        
+        The result is kept as a ``(key, value)`` pair and only turned into
+        ``{key: value}`` when the tool calls are read. Both record methods can be
+        used for the same tool.
+        
+        Args:
+            tool_name: The name of the tool called
+            key: The name of the result field
+            value: The value of the result field
+        """
+        calls = self.tool_calls.get(tool_name)
+        if calls is None:
+            calls = self.tool_calls[tool_name] = _FieldCalls(maxlen=self.TOOL_CALL_HISTORY)
+        elif type(calls) is not _FieldCalls:
+            # The tool already has plain results, so keep recording those
+            self.record_tool_call(tool_name, {key: value})
+            return
+        result = (key, value)
+        # Skip recording the same result twice in a row
+        if not calls or calls[-1] != result:
+            calls.append(result)
     
     def get_tool_calls(self) -> Dict[str, Any]:
         """Get all recorded tool calls.
         
         Returns:
-            Dict of tool calls and their results
+            Dict of tool calls and their most recent results
         """
-        return self.tool_calls
+        return {
+            tool_name: dict((calls[-1],)) if type(calls) is _FieldCalls else calls[-1]
+            for tool_name, calls in self.tool_calls.items() if calls
+        }
+    
+    def get_tool_call_history(self, tool_name: str) -> List[Any]:
+        """Get the recent results recorded for a tool.
+        
+        Args:
+            tool_name: The name of the tool
+            
+        Returns:
+            List of results, oldest first
+        """
+        calls = self.tool_calls.get(tool_name, ())
+        if type(calls) is _FieldCalls:
+            return [dict((call,)) for call in calls]
+        return list(calls)
+    
+    def to_json(self) -> bytes:
+        """Serialize the recorded tool calls to JSON.
+        
+        Returns:
+            UTF-8 encoded JSON of the tool calls
+        """
+        return orjson.dumps(self.get_tool_calls(), option=orjson.OPT_NAIVE_UTC)
     
     def clear_tool_calls(self) -> None:
         """Clear all recorded tool calls."""
-        self.tool_calls = {}
+        self.tool_calls = self._new_tool_calls()
+    
+    def _new_tool_calls(self) -> Dict[str, Deque[Any]]:
+        """Create an empty tool call store with a bounded history per tool.
+        
+        Returns:
+            Mapping of tool names to their recorded results
+        """
+        return defaultdict(lambda: deque(maxlen=self.TOOL_CALL_HISTORY))
@@ -4,25 +4,171 @@ Customer Support Agent with custom tools for the Agent Swarm system.
 This agent is responsible for handling customer support queries and providing
 assistance with account-related issues.
 """
-from typing import Dict, Any, List, Optional
-import os
-import json
-import random
+from __future__ import annotations
+
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import asyncio
+import bisect
+import functools
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from types import MappingProxyType
+
+import numpy as np
 
 from .base_agent import BaseAgent
 
 
+# Common issues and their solutions, shared read-only by every TroubleshootingTool
+_TROUBLESHOOTING_GUIDES = MappingProxyType({
+    "login_issues": MappingProxyType({
+        "title": "Login Issues",
+        "symptoms": ("can't sign in", "unable to log in", "login not working", "password not accepted"),
+        "solutions": (
+            "Reset your password through the 'Forgot Password' link on the login page",
+            "Ensure you're using the correct email address associated with your account",
+            "Check if Caps Lock is enabled when typing your password",
+            "Clear your browser cache and cookies, then try again",
+            "Try using a different browser or device",
+            "Ensure your account hasn't been locked due to multiple failed login attempts"
+        ),
+        "escalation": "If you've tried these steps and still can't log in, please contact our support team with your account email for further assistance."
+    }),
+    "transfer_issues": MappingProxyType({
+        "title": "Transfer Issues",
+        "symptoms": ("can't make transfers", "transfer failed", "payment not going through", "transaction error"),
+        "solutions": (
+            "Check your account balance to ensure you have sufficient funds",
+            "Verify that your account status is active and not restricted",
+            "Ensure you're entering the correct recipient information",
+            "Check if you've reached your daily or monthly transfer limits",
+            "Try making a smaller transfer to see if the issue is amount-related",
+            "Ensure your internet connection is stable when making the transfer"
+        ),
+        "escalation": "If transfers are still failing after these steps, please contact our support team with the specific error message or transaction ID for assistance."
+    }),
+    "app_issues": MappingProxyType({
+        "title": "Mobile App Issues",
+        "symptoms": ("app crashing", "app not loading", "features not working", "app error"),
+        "solutions": (
+            "Update to the latest version of the app from your device's app store",
+            "Restart your device and try opening the app again",
+            "Check your internet connection and ensure it's stable",
+            "Clear the app cache in your device settings",
+            "Uninstall and reinstall the app",
+            "Ensure your device meets the minimum requirements for the app"
+        ),
+        "escalation": "If you're still experiencing issues with the app, please contact our support team with your device model and operating system version for further assistance."
+    }),
+    "card_issues": MappingProxyType({
+        "title": "Card Issues",
+        "symptoms": ("card declined", "card not working", "payment failed", "card blocked"),
+        "solutions": (
+            "Check your card balance to ensure you have sufficient funds",
+            "Verify that your card is activated and not expired",
+            "Ensure you're entering the correct card details for online purchases",
+            "Check if international transactions are enabled for your card",
+            "Temporarily lock and unlock your card through the app",
+            "Check if the merchant accepts your card type"
+        ),
+        "escalation": "If your card is still not working after these steps, please contact our support team for immediate assistance."
+    })
+})
+
+# Response used when no specific issue is identified
+_GENERAL_ISSUE = MappingProxyType({
+    "issue_type": "general",
+    "title": "General Issue",
+    "solutions": (
+        "Please provide more details about the specific issue you're experiencing",
+        "Check our help center for guides on common issues",
+        "Ensure your app and device are updated to the latest versions",
+        "Try restarting your device and the app"
+    ),
+    "escalation": "If you need immediate assistance, please contact our support team with details of your issue."
+})
+
+# Every symptom paired with its issue, in category priority order, so the first
+# symptom found in a message identifies the issue
+_SYMPTOM_ISSUES = tuple(
+    (symptom, issue_key)
+    for issue_key, issue_data in _TROUBLESHOOTING_GUIDES.items()
+    for symptom in issue_data["symptoms"]
+)
+
+# Bounded pool shared by all support agents for running blocking tool calls
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="support-tool")
+
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+# Account statuses and their cumulative sampling weights (most accounts are active)
+_ACCOUNT_STATUSES = ("active", "restricted", "pending_verification", "locked")
+_ACCOUNT_STATUS_CUM_WEIGHTS = (0.7, 0.8, 0.9, 1.0)
+
+# Transaction types by direction and the possible transaction statuses
+_DEBIT_TYPES = np.array(["purchase", "transfer_out", "withdrawal", "payment"])
+_CREDIT_TYPES = np.array(["deposit", "transfer_in", "refund", "payment_received"])
+_TRANSACTION_STATUSES = np.array(["completed", "pending", "failed"])
+
+# Fixed account-specific advice appended to support responses
+_LOCKED_ACCOUNT_ADVICE = (
+    "\nYour account appears to be locked. This is often due to multiple failed login attempts. "
+    "You'll need to contact our support team to unlock your account.\n"
+)
+_RESTRICTED_TRANSFER_ADVICE = "\nYour account currently has restrictions that may be limiting transfer capabilities.\n"
+
+
+@functools.lru_cache(maxsize=64)
+def _numbered_solutions(solutions: Tuple[str, ...]) -> str:
+    """Format troubleshooting solutions as a numbered list.
+    
+    Solutions are static per issue, so each list is formatted once and reused.
+    
+    Args:
+        solutions: The solutions to format
+        
+    Returns:
+        The numbered list, one solution per line
+    """
+    return "".join(f"{i}. {solution}\n" for i, solution in enumerate(solutions, 1))
+
+
+def _negated_date_epoch(transaction: Dict[str, Any]) -> int:
+    """Sort key that orders transactions newest first by their epoch date."""
+    return -transaction["date_epoch"]
+
+
 class AccountStatusTool:
     """Tool for checking account status and recent transactions."""
     
-    def __init__(self):
-        """Initialize the account status tool."""
+    TEMPLATE_POOL_SIZE = 256
+    
+    def __init__(self, max_users: int = 10_000, user_ttl_seconds: float = 3600):
+        """Initialize the account status tool.
+        
+        Args:
+            max_users: Maximum number of users whose account data is kept in memory
+            user_ttl_seconds: Seconds without access after which a user's account data is evicted
+        """
         # In a real implementation, this would connect to a database or API
         # For this demo, we'll use simulated data
-        self.user_data = {
-            # Simulated user data store
-        }
+        self.max_users = max_users
+        self.user_ttl_seconds = user_ttl_seconds
+        
+        # Simulated user data store of (last access time, account data), least recently used first
+        self.user_data: OrderedDict[str, Tuple[float, Dict[str, Any]]] = OrderedDict()
+        self._user_data_lock = threading.Lock()
+        self._rng = np.random.default_rng()
+        
+        # Pool of pre-generated accounts that new users are mapped onto, so generating
+        # mock data stays off the request path. Templates keep their dates as ages in days,
+        # which are turned into dates when a template is assigned to a user
+        self._templates = [self._generate_mock_account_template() for _ in range(self.TEMPLATE_POOL_SIZE)]
     
     def get_account_status(self, user_id: str) -> Dict[str, Any]:
         """Get the account status for a user.
@@ -36,11 +182,7 @@ class AccountStatusTool:
         # Simulate fetching account data
         # In a real implementation, this would query a database or API
         
-        # Generate random account data if we don't have it for this user
-        if user_id not in self.user_data:
-            self.user_data[user_id] = self._generate_mock_account_data(user_id)
-            
-        return self.user_data[user_id]
+        return self._get_account_data(user_id)
     
     def get_recent_transactions(self, user_id: str, days: int = 7) -> List[Dict[str, Any]]:
         """Get recent transactions for a user.
@@ -52,87 +194,146 @@ class AccountStatusTool:
         Returns:
             List of recent transactions
         """
-        # Ensure we have data for this user
-        if user_id not in self.user_data:
-            self.user_data[user_id] = self._generate_mock_account_data(user_id)
-            
         # Get transactions from the last N days
-        account_data = self.user_data[user_id]
+        account_data = self._get_account_data(user_id)
         transactions = account_data.get("transactions", [])
         
-        # Filter to only include recent transactions
-        cutoff_date = datetime.now() - timedelta(days=days)
-        recent_transactions = [
-            t for t in transactions 
-            if datetime.fromisoformat(t["date"]) > cutoff_date
-        ]
+        # Transactions are sorted newest first, so the recent ones form a prefix
+        cutoff_epoch = int(time.time()) - days * _SECONDS_PER_DAY
+        num_recent = bisect.bisect_left(transactions, -cutoff_epoch, key=_negated_date_epoch)
+        
+        return transactions[:num_recent]
+    
+    def _get_account_data(self, user_id: str) -> Dict[str, Any]:
+        """Get the stored account data for a user, assigning it on first access.
+        
+        Users idle for longer than the TTL, and the least recently used users beyond
+        max_users, are evicted. Their data is rebuilt from the same template on the
+        next access.
+        
+        Args:
+            user_id: The ID of the user
+            
+        Returns:
+            Dict containing account data
+        """
+        # Stored keys are interned, so repeated lookups for a user compare by identity
+        user_id = sys.intern(user_id)
+        now = time.monotonic()
+        with self._user_data_lock:
+            entry = self.user_data.get(user_id)
+            if entry is not None and now - entry[0] < self.user_ttl_seconds:
+                account_data = entry[1]
+            else:
+                account_data = self._account_from_template(user_id)
+            self.user_data[user_id] = (now, account_data)
+            self.user_data.move_to_end(user_id)
+            
+            # Entries are ordered by last access, so expired users sit at the front
+            while self.user_data:
+                oldest_access, _ = next(iter(self.user_data.values()))
+                if len(self.user_data) <= self.max_users and now - oldest_access < self.user_ttl_seconds:
+                    break
+                self.user_data.popitem(last=False)
+        
+        return account_data
+    
+    def _template_index(self, user_id: str) -> int:
+        """Get the index of the template account assigned to a user.
         
-        return recent_transactions
+        Args:
+            user_id: The ID of the user
+            
+        Returns:
+            Index into the template pool
+        """
+        # crc32 is stable across processes, unlike the builtin str hash
+        return zlib.crc32(user_id.encode()) % len(self._templates)
     
-    def _generate_mock_account_data(self, user_id: str) -> Dict[str, Any]:
-        """Generate mock account data for a user.
+    def _account_from_template(self, user_id: str) -> Dict[str, Any]:
+        """Build account data for a user from the pre-generated template pool.
         
         Args:
             user_id: The ID of the user
             
         Returns:
-            Dict containing mock account data
+            Dict containing mock account data for the user
         """
-        # Account statuses
-        statuses = ["active", "restricted", "pending_verification", "locked"]
-        status_weights = [0.7, 0.1, 0.1, 0.1]  # Most accounts are active
+        user_hash = zlib.crc32(user_id.encode())
+        template, days_ago, last_login_days_ago = self._templates[self._template_index(user_id)]
         
+        # Date the template's transactions relative to now
+        now = datetime.now()
+        now_epoch = int(now.timestamp())
+        transactions = [
+            {
+                **transaction,
+                "date": (now - timedelta(days=days)).isoformat(),
+                "date_epoch": now_epoch - days * _SECONDS_PER_DAY
+            }
+            for transaction, days in zip(template["transactions"], days_ago)
+        ]
+        
+        return {
+            "user_id": user_id,
+            "account_number": f"ACCT-{user_hash % 90000 + 10000}",
+            **template,
+            "last_login": (now - timedelta(days=last_login_days_ago)).isoformat(),
+            "transactions": transactions
+        }
+    
+    def _generate_mock_account_template(self) -> Tuple[Dict[str, Any], List[int], int]:
+        """Generate mock account data, with dates left as ages in days.
+        
+        The user ID and account number are filled in when the template is assigned to a user.
+        
+        Returns:
+            Tuple of the account data without dates, the age of each transaction
+            (newest first) and the age of the last login
+        """
         # Generate a random account status
-        account_status = random.choices(statuses, status_weights)[0]
+        account_status = _ACCOUNT_STATUSES[bisect.bisect_right(_ACCOUNT_STATUS_CUM_WEIGHTS, self._rng.random())]
         
         # Generate random balance
-        balance = round(random.uniform(100, 5000), 2)
+        balance = round(float(self._rng.uniform(100, 5000)), 2)
         
-        # Generate random transactions
-        num_transactions = random.randint(5, 15)
-        transactions = []
+        # Generate random transactions, drawing each field for all of them at once
+        num_transactions = int(self._rng.integers(5, 16))
         
-        for _ in range(num_transactions):
-            # Random date in the last 30 days
-            days_ago = random.randint(0, 30)
-            transaction_date = datetime.now() - timedelta(days=days_ago)
-            
-            # Random amount (negative for debits, positive for credits)
-            amount = round(random.uniform(-500, 500), 2)
-            
-            # Transaction types
-            if amount < 0:
-                transaction_type = random.choice(["purchase", "transfer_out", "withdrawal", "payment"])
-            else:
-                transaction_type = random.choice(["deposit", "transfer_in", "refund", "payment_received"])
-                
-            # Create transaction
-            transaction = {
-                "id": f"txn_{random.randint(10000, 99999)}",
-                "date": transaction_date.isoformat(),
-                "amount": amount,
-                "type": transaction_type,
-                "description": f"{transaction_type.replace('_', ' ').title()} - {abs(amount):.2f} BRL",
-                "status": random.choice(["completed", "pending", "failed"]),
+        # Random dates in the last 30 days
+        days_ago = self._rng.integers(0, 31, num_transactions)
+        newest_first = np.argsort(days_ago, kind="stable")
+        
+        # Random amounts (negative for debits, positive for credits) and matching types
+        amounts = np.round(self._rng.uniform(-500, 500, num_transactions), 2)
+        type_idx = self._rng.integers(0, 4, num_transactions)
+        transaction_types = np.where(amounts < 0, _DEBIT_TYPES[type_idx], _CREDIT_TYPES[type_idx])
+        
+        ids = self._rng.integers(10000, 100000, num_transactions)
+        statuses = _TRANSACTION_STATUSES[self._rng.integers(0, 3, num_transactions)]
+        
+        # Create transactions sorted by date (newest first)
+        transactions = [
+            {
+                "id": f"txn_{ids[i]}",
+                "amount": float(amounts[i]),
+                "type": str(transaction_types[i]),
+                "description": f"{str(transaction_types[i]).replace('_', ' ').title()} - {abs(amounts[i]):.2f} BRL",
+                "status": str(statuses[i]),
             }
-            
-            transactions.append(transaction)
-            
-        # Sort transactions by date (newest first)
-        transactions.sort(key=lambda x: x["date"], reverse=True)
+            for i in newest_first
+        ]
         
         # Create account data
         account_data = {
-            "user_id": user_id,
-            "account_number": f"ACCT-{random.randint(10000, 99999)}",
             "status": account_status,
             "balance": balance,
             "currency": "BRL",
-            "last_login": (datetime.now() - timedelta(days=random.randint(0, 7))).isoformat(),
+            "last_login": None,
             "transactions": transactions
         }
         
-        return account_data
+        return account_data, days_ago[newest_first].tolist(), int(self._rng.integers(0, 8))
 
 
 class TroubleshootingTool:
@@ -140,61 +341,8 @@ class TroubleshootingTool:
     
     def __init__(self):
         """Initialize the troubleshooting tool."""
-        # Common issues and their solutions
-        self.troubleshooting_guides = {
-            "login_issues": {
-                "title": "Login Issues",
-                "symptoms": ["can't sign in", "unable to log in", "login not working", "password not accepted"],
-                "solutions": [
-                    "Reset your password through the 'Forgot Password' link on the login page",
-                    "Ensure you're using the correct email address associated with your account",
-                    "Check if Caps Lock is enabled when typing your password",
-                    "Clear your browser cache and cookies, then try again",
-                    "Try using a different browser or device",
-                    "Ensure your account hasn't been locked due to multiple failed login attempts"
-                ],
-                "escalation": "If you've tried these steps and still can't log in, please contact our support team with your account email for further assistance."
-            },
-            "transfer_issues": {
-                "title": "Transfer Issues",
-                "symptoms": ["can't make transfers", "transfer failed", "payment not going through", "transaction error"],
-                "solutions": [
-                    "Check your account balance to ensure you have sufficient funds",
-                    "Verify that your account status is active and not restricted",
-                    "Ensure you're entering the correct recipient information",
-                    "Check if you've reached your daily or monthly transfer limits",
-                    "Try making a smaller transfer to see if the issue is amount-related",
-                    "Ensure your internet connection is stable when making the transfer"
-                ],
-                "escalation": "If transfers are still failing after these steps, please contact our support team with the specific error message or transaction ID for assistance."
-            },
-            "app_issues": {
-                "title": "Mobile App Issues",
-                "symptoms": ["app crashing", "app not loading", "features not working", "app error"],
-                "solutions": [
-                    "Update to the latest version of the app from your device's app store",
-                    "Restart your device and try opening the app again",
-                    "Check your internet connection and ensure it's stable",
-                    "Clear the app cache in your device settings",
-                    "Uninstall and reinstall the app",
-                    "Ensure your device meets the minimum requirements for the app"
-                ],
-                "escalation": "If you're still experiencing issues with the app, please contact our support team with your device model and operating system version for further assistance."
-            },
-            "card_issues": {
-                "title": "Card Issues",
-                "symptoms": ["card declined", "card not working", "payment failed", "card blocked"],
-                "solutions": [
-                    "Check your card balance to ensure you have sufficient funds",
-                    "Verify that your card is activated and not expired",
-                    "Ensure you're entering the correct card details for online purchases",
-                    "Check if international transactions are enabled for your card",
-                    "Temporarily lock and unlock your card through the app",
-                    "Check if the merchant accepts your card type"
-                ],
-                "escalation": "If your card is still not working after these steps, please contact our support team for immediate assistance."
-            }
-        }
+        self.troubleshooting_guides = _TROUBLESHOOTING_GUIDES
+        self._symptom_issues = _SYMPTOM_ISSUES
     
     def identify_issue(self, message: str) -> Dict[str, Any]:
         """Identify the issue based on the user's message.
@@ -207,29 +355,19 @@ class TroubleshootingTool:
         """
         message_lower = message.lower()
         
-        # Check each issue category for matching symptoms
-        for issue_key, issue_data in self.troubleshooting_guides.items():
-            for symptom in issue_data["symptoms"]:
-                if symptom in message_lower:
-                    return {
-                        "issue_type": issue_key,
-                        "title": issue_data["title"],
-                        "solutions": issue_data["solutions"],
-                        "escalation": issue_data["escalation"]
-                    }
+        # Symptoms are ordered by category priority, so the first match wins
+        for symptom, issue_key in self._symptom_issues:
+            if symptom in message_lower:
+                issue_data = self.troubleshooting_guides[issue_key]
+                return {
+                    "issue_type": issue_key,
+                    "title": issue_data["title"],
+                    "solutions": issue_data["solutions"],
+                    "escalation": issue_data["escalation"]
+                }
         
         # If no specific issue is identified, return a general response
-        return {
-            "issue_type": "general",
-            "title": "General Issue",
-            "solutions": [
-                "Please provide more details about the specific issue you're experiencing",
-                "Check our help center for guides on common issues",
-                "Ensure your app and device are updated to the latest versions",
-                "Try restarting your device and the app"
-            ],
-            "escalation": "If you need immediate assistance, please contact our support team with details of your issue."
-        }
+        return dict(_GENERAL_ISSUE)
 
 
 class CustomerSupportAgent(BaseAgent):
@@ -249,6 +387,7 @@ class CustomerSupportAgent(BaseAgent):
         super().__init__(name)
         self.account_tool = AccountStatusTool()
         self.troubleshooting_tool = TroubleshootingTool()
+        self._executor = _TOOL_EXECUTOR
     
     async def process(self, message: str, user_id: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Process a support message and provide assistance.
@@ -261,17 +400,22 @@ class CustomerSupportAgent(BaseAgent):
         Returns:
             Dict containing the response and any additional information
         """
-        # First, check if this is a troubleshooting issue
-        troubleshooting_result = self.troubleshooting_tool.identify_issue(message)
-        self.record_tool_call("troubleshooting", troubleshooting_result)
+        # Intern the user ID once so the account store lookups below compare by identity
+        user_id = sys.intern(user_id)
         
-        # Get account status information
-        account_status = self.account_tool.get_account_status(user_id)
+        # Identify the issue and fetch the account status concurrently, as they are independent
+        troubleshooting_result, account_status = await asyncio.gather(
+            self._run_tool(self.troubleshooting_tool.identify_issue, message),
+            self._run_tool(self.account_tool.get_account_status, user_id)
+        )
+        self.record_tool_call("troubleshooting", troubleshooting_result)
         self.record_tool_call("account_status", {"user_id": user_id, "status": account_status["status"]})
         
         # Get recent transactions if relevant to the issue
         if troubleshooting_result["issue_type"] in ["transfer_issues", "card_issues"]:
-            recent_transactions = self.account_tool.get_recent_transactions(user_id, days=7)
+            recent_transactions = await self._run_tool(
+                self.account_tool.get_recent_transactions, user_id, days=7
+            )
             self.record_tool_call("recent_transactions", {"user_id": user_id, "count": len(recent_transactions)})
         
         # Generate a response based on the issue and account information
@@ -282,6 +426,20 @@ class CustomerSupportAgent(BaseAgent):
             "agent_type": "support"
         }
     
+    async def _run_tool(self, tool: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking tool call in the shared thread pool so the event loop stays free.
+        
+        Args:
+            tool: The tool method to call
+            *args: Positional arguments for the tool
+            **kwargs: Keyword arguments for the tool
+            
+        Returns:
+            The result returned by the tool
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(tool, *args, **kwargs))
+    
     def _generate_support_response(self, message: str, troubleshooting: Dict[str, Any], account: Dict[str, Any]) -> str:
         """Generate a support response based on the issue and account information.
         
@@ -294,29 +452,27 @@ class CustomerSupportAgent(BaseAgent):
             Support response string
         """
         # Start with a greeting
-        response = f"I understand you're having an issue with {troubleshooting['title'].lower()}. "
+        parts = [f"I understand you're having an issue with {troubleshooting['title'].lower()}. "]
         
         # Add account status context
         if account["status"] != "active":
-            response += f"I noticed that your account status is currently '{account['status']}', which might be related to your issue. "
+            parts.append(f"I noticed that your account status is currently '{account['status']}', which might be related to your issue. ")
         
         # Add troubleshooting steps
-        response += "Here are some steps that might help:\n\n"
-        for i, solution in enumerate(troubleshooting["solutions"], 1):
-            response += f"{i}. {solution}\n"
+        parts.append("Here are some steps that might help:\n\n")
+        parts.append(_numbered_solutions(tuple(troubleshooting["solutions"])))
         
         # Add account-specific advice
         if troubleshooting["issue_type"] == "login_issues" and account["status"] == "locked":
-            response += "\nYour account appears to be locked. This is often due to multiple failed login attempts. "
-            response += "You'll need to contact our support team to unlock your account.\n"
+            parts.append(_LOCKED_ACCOUNT_ADVICE)
         
         elif troubleshooting["issue_type"] == "transfer_issues":
             if account["balance"] < 10:
-                response += f"\nI noticed your account balance is low (R${account['balance']:.2f}), which might be preventing transfers.\n"
+                parts.append(f"\nI noticed your account balance is low (R${account['balance']:.2f}), which might be preventing transfers.\n")
             elif account["status"] == "restricted":
-                response += "\nYour account currently has restrictions that may be limiting transfer capabilities.\n"
+                parts.append(_RESTRICTED_TRANSFER_ADVICE)
         
         # Add escalation information
-        response += f"\n{troubleshooting['escalation']}"
+        parts.append(f"\n{troubleshooting['escalation']}")
         
-        return response
+        return "".join(parts)
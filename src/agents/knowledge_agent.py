@@ -4,21 +4,122 @@ Knowledge Agent with RAG capabilities for the Agent Swarm system.
 This agent is responsible for handling queries that require information retrieval
 and generation, particularly about InfinitePay products and services.
 """
-from typing import Dict, Any, List, Optional
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+import asyncio
+import contextlib
+import hashlib
+import itertools
 import os
-import requests
-from bs4 import BeautifulSoup
 import re
-from langchain_community.document_loaders import WebBaseLoader
+import time
+from collections import OrderedDict
+
+import faiss
+import httpx
+import numpy as np
+import orjson
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from langchain.chains import RetrievalQA
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
+from langchain_core.documents import Document
+from selectolax.lexbor import LexborHTMLParser
 
 from .base_agent import BaseAgent
 
+if TYPE_CHECKING:
+    from langchain_openai import OpenAIEmbeddings
+
+
+# Patterns indicating a question about InfinitePay products
+_INFINITEPAY_PATTERNS = [
+    r"infinitepay",
+    r"infinite pay",
+    r"maquininha",
+    r"card machine",
+    r"card reader",
+    r"tap to pay",
+    r"pix",
+    r"boleto",
+    r"conta digital",
+    r"digital account",
+    r"emprestimo",
+    r"loan",
+    r"cartao",
+    r"card"
+]
+
+# Patterns indicating a general knowledge question
+_GENERAL_PATTERNS = [
+    r"(news|information) (about|on|regarding)",
+    r"(latest|recent) (news|information|updates)",
+    r"weather",
+    r"sports",
+    r"politics",
+    r"entertainment",
+    r"technology",
+    r"science",
+    r"health",
+    r"education",
+    r"business",
+    r"economy",
+    r"stock market",
+    r"cryptocurrency"
+]
+
+# Each list is compiled once into a single alternation
+_INFINITEPAY_RE = re.compile("|".join(_INFINITEPAY_PATTERNS))
+_GENERAL_RE = re.compile("|".join(_GENERAL_PATTERNS))
+
+
+class FastWebLoader:
+    """Loader that fetches a web page and extracts its visible text with selectolax."""
+    
+    def __init__(self, url: str, timeout: float = 10.0):
+        """Initialize the loader.
+        
+        Args:
+            url: The URL of the page to load
+            timeout: Request timeout in seconds
+        """
+        self.url = url
+        self.timeout = timeout
+    
+    async def aload(self, client: httpx.AsyncClient) -> List[Document]:
+        """Fetch the page over a shared async client and convert it to a document.
+        
+        Args:
+            client: HTTP client reused across pages, so connections are not re-established
+            
+        Returns:
+            List containing a single document with the page text
+        """
+        response = await client.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return self._parse(response.text)
+    
+    def _parse(self, html: str) -> List[Document]:
+        """Extract the visible text and title of a page.
+        
+        Args:
+            html: The page HTML
+            
+        Returns:
+            List containing a single document with the page text
+        """
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(["script", "style", "noscript"])
+        
+        metadata = {"source": self.url}
+        title = tree.css_first("title")
+        if title is not None:
+            metadata["title"] = title.text(strip=True)
+        
+        body = tree.body or tree.root
+        text = body.text(separator="\n", strip=True) if body is not None else ""
+        return [Document(page_content=text, metadata=metadata)]
+
 
 class KnowledgeAgent(BaseAgent):
     """
@@ -57,8 +158,24 @@ class KnowledgeAgent(BaseAgent):
             "https://www.infinitepay.io/cartao",
             "https://www.infinitepay.io/rendimento"
         ]
+        self.max_concurrent_loads = 8
+        self.chunk_size = 1000
+        self.chunk_overlap = 200
+        self.embedding_batch_size = 256
+        self.max_concurrent_embeddings = 8
+        # Compressed IVF-PQ index settings, used once the corpus is large enough to train it
+        self.ivfpq_min_vectors = 10_000
+        self.ivfpq_nlist = 64
+        self.ivfpq_m = 64
+        self.ivfpq_nbits = 8
+        self.ivfpq_nprobe = 8
+        self.cache_dir = os.environ.get("RAG_CACHE_DIR", ".rag_cache")
+        self.cache_max_age_seconds = 24 * 60 * 60
+        self.answer_cache_size = 1024
+        self._answer_cache: OrderedDict[str, str] = OrderedDict()
         self.vectorstore = None
         self.qa_chain = None
+        self._init_task: Optional[asyncio.Task] = None
         
     async def process(self, message: str, user_id: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Process a message by retrieving relevant information and generating a response.
@@ -73,7 +190,7 @@ class KnowledgeAgent(BaseAgent):
         """
         # Ensure the vectorstore is initialized
         if self.vectorstore is None:
-            await self._initialize_rag_pipeline()
+            await self._ensure_initialized()
         
         # Check if this is a general knowledge question that might require web search
         if self._is_general_knowledge_question(message):
@@ -87,32 +204,100 @@ class KnowledgeAgent(BaseAgent):
             "agent_type": "knowledge"
         }
     
+    async def prewarm(self) -> None:
+        """Start initializing the RAG pipeline in the background.
+        
+        Call this at application startup so scraping and embedding overlap with idle
+        time instead of delaying the first query.
+        """
+        if self._init_task is None and self.vectorstore is None:
+            self._init_task = asyncio.create_task(self._initialize_rag_pipeline())
+            self._init_task.add_done_callback(self._on_initialized)
+    
+    def _on_initialized(self, task: asyncio.Task) -> None:
+        """Record the outcome of a background pipeline initialization.
+        
+        Args:
+            task: The finished initialization task
+        """
+        if not task.cancelled() and task.exception() is not None:
+            self.record_tool_call("initialize_rag", {"status": "error", "error": str(task.exception())})
+    
+    async def _ensure_initialized(self) -> None:
+        """Wait for the RAG pipeline, starting it if no initialization is in progress.
+        
+        Concurrent first queries share one initialization. A failed or cancelled
+        initialization, including a failed prewarm, is retried by the next query.
+        """
+        task = self._init_task
+        if task is not None and task.done() and (task.cancelled() or task.exception() is not None):
+            self._init_task = None
+        
+        if self._init_task is None:
+            await self.prewarm()
+        
+        task = self._init_task
+        try:
+            # Shield the shared task so that a cancelled query does not cancel it for every other one
+            await asyncio.shield(task)
+        except Exception:
+            if self._init_task is task:
+                self._init_task = None
+            raise
+    
+    async def shutdown(self) -> None:
+        """Cancel a background pipeline initialization that is still running."""
+        task = self._init_task
+        if task is not None and not task.done():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    
     async def _initialize_rag_pipeline(self) -> None:
         """Initialize the RAG pipeline by scraping the InfinitePay website and creating a vectorstore."""
+        # The OpenAI clients and the QA chain are only used here, so they are imported on first
+        # use instead of with the module
+        from langchain.chains import RetrievalQA
+        from langchain.prompts import PromptTemplate
+        from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+        
         # Record this operation
         self.record_tool_call("initialize_rag", {"status": "starting"})
         
-        # Load documents from the InfinitePay website
-        documents = []
-        for url in self.infinitepay_urls:
-            try:
-                loader = WebBaseLoader(url)
-                docs = loader.load()
-                documents.extend(docs)
-                self.record_tool_call("web_scraping", {"url": url, "status": "success"})
-            except Exception as e:
-                self.record_tool_call("web_scraping", {"url": url, "status": "error", "error": str(e)})
-        
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+        embeddings = OpenAIEmbeddings(
+            api_key=self.api_key,
+            chunk_size=self.embedding_batch_size,
+            max_retries=6
         )
-        splits = text_splitter.split_documents(documents)
         
-        # Create vectorstore
-        embeddings = OpenAIEmbeddings(api_key=self.api_key)
-        self.vectorstore = FAISS.from_documents(splits, embeddings)
+        # Reuse a previously persisted vectorstore if one is still fresh
+        self.vectorstore = self._load_cached_vectorstore(embeddings)
+        if self.vectorstore is None:
+            # Load documents from the InfinitePay website concurrently
+            # over one HTTP/2 connection shared by all pages
+            semaphore = asyncio.Semaphore(self.max_concurrent_loads)
+            async with httpx.AsyncClient(http2=True, follow_redirects=True) as client:
+                results = await asyncio.gather(
+                    *(self._load_url(url, semaphore, client) for url in self.infinitepay_urls)
+                )
+            documents = list(itertools.chain.from_iterable(docs for docs in results if docs is not None))
+            
+            # Split documents into chunks
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap
+            )
+            splits = text_splitter.split_documents(documents)
+            
+            # Embed the chunks in parallel batches, then create the vectorstore
+            texts = [split.page_content for split in splits]
+            metadatas = [split.metadata for split in splits]
+            vectors = await self._embed_texts(embeddings, texts)
+            self.vectorstore = self._build_vectorstore(embeddings, texts, vectors, metadatas)
+            
+            # Only persist a complete scrape, so pages that failed to load are retried on the next start
+            if None not in results:
+                self._save_cached_vectorstore()
         
         # Create QA chain
         llm = ChatOpenAI(
@@ -144,6 +329,139 @@ class KnowledgeAgent(BaseAgent):
         
         self.record_tool_call("initialize_rag", {"status": "completed"})
     
+    async def _embed_texts(self, embeddings: OpenAIEmbeddings, texts: List[str]) -> List[List[float]]:
+        """Embed texts by sending batches to the embeddings API concurrently.
+        
+        Args:
+            embeddings: Embeddings client used for each batch
+            texts: The texts to embed
+            
+        Returns:
+            One embedding vector per text, in the same order
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_embeddings)
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await asyncio.to_thread(embeddings.embed_documents, batch)
+        
+        batches = [
+            texts[i:i + self.embedding_batch_size]
+            for i in range(0, len(texts), self.embedding_batch_size)
+        ]
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        
+        return list(itertools.chain.from_iterable(results))
+    
+    def _build_vectorstore(
+        self,
+        embeddings: OpenAIEmbeddings,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: List[Dict[str, Any]]
+    ) -> FAISS:
+        """Build the vectorstore, compressing it with an IVF-PQ index when the corpus is large.
+        
+        Small corpora keep the exact flat index, since IVF-PQ needs enough vectors to
+        train its clusters and codebooks and brings no speedup at that size.
+        
+        Args:
+            embeddings: Embeddings used to embed queries
+            texts: The document texts
+            vectors: The embedding vector of each text
+            metadatas: The metadata of each text
+            
+        Returns:
+            The populated vectorstore
+        """
+        dimension = len(vectors[0]) if vectors else 0
+        if len(vectors) < self.ivfpq_min_vectors or dimension % self.ivfpq_m:
+            return FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas)
+        
+        quantizer = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, self.ivfpq_nlist, self.ivfpq_m, self.ivfpq_nbits)
+        index.train(np.asarray(vectors, dtype="float32"))
+        index.nprobe = self.ivfpq_nprobe
+        
+        vectorstore = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={}
+        )
+        vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+        self.record_tool_call("vectorstore_index", {"type": "ivfpq", "vectors": len(vectors)})
+        return vectorstore
+    
+    def _cache_path(self) -> str:
+        """Get the directory where the vectorstore for the current sources is persisted.
+        
+        Returns:
+            Path keyed by a hash of the source URLs and chunking parameters
+        """
+        key_source = orjson.dumps({
+            "urls": sorted(self.infinitepay_urls),
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap
+        })
+        key = hashlib.sha256(key_source).hexdigest()[:16]
+        return os.path.join(self.cache_dir, key)
+    
+    def _load_cached_vectorstore(self, embeddings: OpenAIEmbeddings) -> Optional[FAISS]:
+        """Load the persisted vectorstore if it exists and has not expired.
+        
+        Args:
+            embeddings: Embeddings used to query the loaded vectorstore
+            
+        Returns:
+            The cached vectorstore, or None if it is missing, stale or unreadable
+        """
+        path = self._cache_path()
+        try:
+            with open(os.path.join(path, "meta.json"), "rb") as f:
+                meta = orjson.loads(f.read())
+            if time.time() - meta["created_at"] > self.cache_max_age_seconds:
+                return None
+            vectorstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        except Exception:
+            return None
+        
+        self.record_tool_call("rag_cache", {"path": path, "status": "hit"})
+        return vectorstore
+    
+    def _save_cached_vectorstore(self) -> None:
+        """Persist the current vectorstore so later starts can skip scraping and embedding."""
+        path = self._cache_path()
+        try:
+            self.vectorstore.save_local(path)
+            with open(os.path.join(path, "meta.json"), "wb") as f:
+                f.write(orjson.dumps({"created_at": time.time()}))
+            self.record_tool_call("rag_cache", {"path": path, "status": "saved"})
+        except Exception as e:
+            self.record_tool_call("rag_cache", {"path": path, "status": "error", "error": str(e)})
+    
+    async def _load_url(
+        self, url: str, semaphore: asyncio.Semaphore, client: httpx.AsyncClient
+    ) -> Optional[List[Document]]:
+        """Load the documents for a single URL without blocking the event loop.
+        
+        Args:
+            url: The URL to scrape
+            semaphore: Semaphore bounding the number of concurrent loads
+            client: HTTP client shared by all loads
+            
+        Returns:
+            List of loaded documents, or None if the URL could not be loaded
+        """
+        async with semaphore:
+            try:
+                docs = await FastWebLoader(url).aload(client)
+                self.record_tool_call("web_scraping", {"url": url, "status": "success"})
+                return docs
+            except Exception as e:
+                self.record_tool_call("web_scraping", {"url": url, "status": "error", "error": str(e)})
+                return None
+    
     def _is_general_knowledge_question(self, message: str) -> bool:
         """Determine if a message is asking for general knowledge rather than InfinitePay-specific info.
         
@@ -157,48 +475,12 @@ class KnowledgeAgent(BaseAgent):
         message_lower = message.lower()
         
         # Check for InfinitePay mentions
-        infinitepay_patterns = [
-            r"infinitepay",
-            r"infinite pay",
-            r"maquininha",
-            r"card machine",
-            r"card reader",
-            r"tap to pay",
-            r"pix",
-            r"boleto",
-            r"conta digital",
-            r"digital account",
-            r"emprestimo",
-            r"loan",
-            r"cartao",
-            r"card"
-        ]
-        
-        for pattern in infinitepay_patterns:
-            if re.search(pattern, message_lower):
-                return False
+        if _INFINITEPAY_RE.search(message_lower):
+            return False
         
         # Check for general knowledge patterns
-        general_patterns = [
-            r"(news|information) (about|on|regarding)",
-            r"(latest|recent) (news|information|updates)",
-            r"weather",
-            r"sports",
-            r"politics",
-            r"entertainment",
-            r"technology",
-            r"science",
-            r"health",
-            r"education",
-            r"business",
-            r"economy",
-            r"stock market",
-            r"cryptocurrency"
-        ]
-        
-        for pattern in general_patterns:
-            if re.search(pattern, message_lower):
-                return True
+        if _GENERAL_RE.search(message_lower):
+            return True
         
         # Default to False (assume InfinitePay-related)
         return False
@@ -241,6 +523,13 @@ class KnowledgeAgent(BaseAgent):
         # Record this operation
         self.record_tool_call("rag_query", {"query": message})
         
+        # Serve repeated questions from the answer cache
+        cache_key = " ".join(message.lower().split())
+        if cache_key in self._answer_cache:
+            self._answer_cache.move_to_end(cache_key)
+            self.record_tool_call("rag_answer_cache", {"query": message, "status": "hit"})
+            return self._answer_cache[cache_key]
+        
         try:
             # Run the query through the QA chain
             result = self.qa_chain.invoke({"query": message})
@@ -255,6 +544,10 @@ class KnowledgeAgent(BaseAgent):
                     "https://www.infinitepay.io or contacting their customer support directly."
                 )
             
+            self._answer_cache[cache_key] = response
+            if len(self._answer_cache) > self.answer_cache_size:
+                self._answer_cache.popitem(last=False)
+            
             return response
         except Exception as e:
             self.record_tool_call("rag_error", {"error": str(e)})
@@ -4,13 +4,114 @@ Personality Layer for the Agent Swarm system.
 This agent is responsible for transforming responses from other agents
 to make them more human-like and engaging.
 """
-from typing import Dict, Any, List, Optional
+from __future__ import annotations
+
+from typing import Dict, Any, Mapping, Optional, Tuple
+from types import MappingProxyType
+import asyncio
 import re
-import random
+import numpy as np
 
 from .base_agent import BaseAgent
 
 
+# Prefixes marking a paragraph as a list item, which is left without conversational additions
+_LIST_ITEM_PREFIXES = ('•', '-', '*', '1.')
+
+# Personality traits and language patterns, shared read-only by every PersonalityAgent
+_PERSONALITIES = MappingProxyType({
+    "friendly": MappingProxyType({
+        "greetings": ("Hi there!", "Hello!", "Hey!", "Greetings!"),
+        "closings": ("Hope that helps!", "Let me know if you need anything else!", 
+                     "I'm here if you have more questions!", "Happy to assist further!"),
+        "acknowledgments": ("I understand", "I see", "Got it", "I hear you"),
+        "transitions": ("So", "Well", "Now", "Alright"),
+        "fillers": ("actually", "you know", "basically", "essentially"),
+        "emojis": ("😊", "👍", "✨", "🙌"),
+        "emoji_frequency": 0.3,  # Probability of adding an emoji
+        "exclamation_frequency": 0.4,  # Probability of using exclamation marks
+    }),
+    "professional": MappingProxyType({
+        "greetings": ("Good day", "Greetings", "Hello", "Welcome"),
+        "closings": ("Please let me know if you require further assistance.", 
+                     "I'm available if you have additional questions.", 
+                     "Don't hesitate to reach out for more information.",
+                     "Thank you for your inquiry."),
+        "acknowledgments": ("I understand", "Noted", "I see", "Understood"),
+        "transitions": ("Therefore", "Additionally", "Furthermore", "Moreover"),
+        "fillers": ("specifically", "particularly", "notably", "indeed"),
+        "emojis": (),
+        "emoji_frequency": 0,
+        "exclamation_frequency": 0.1,
+    }),
+    "casual": MappingProxyType({
+        "greetings": ("Hey!", "What's up?", "Hi!", "Howdy!"),
+        "closings": ("Catch you later!", "Hope that works for you!", 
+                     "Let me know if you need anything!", "Take care!"),
+        "acknowledgments": ("Sure thing", "Got it", "I hear ya", "Totally"),
+        "transitions": ("So", "Anyway", "Alright", "OK"),
+        "fillers": ("like", "kinda", "pretty much", "sort of"),
+        "emojis": ("😊", "👍", "✌️", "🙂", "😉", "🤔", "💯"),
+        "emoji_frequency": 0.5,
+        "exclamation_frequency": 0.6,
+    })
+})
+
+# Shortest response transformed in a worker thread rather than on the event loop
+_OFFLOAD_MIN_LENGTH = 2048
+
+
+# Order of the phrase pools packed into each personality's phrase array
+_POOL_NAMES = ("greetings", "closings", "acknowledgments", "transitions", "fillers", "emojis")
+_GREETING, _CLOSING, _ACKNOWLEDGMENT, _TRANSITION, _FILLER, _EMOJI = range(len(_POOL_NAMES))
+
+
+def _pack_phrases(personality: Mapping[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pack a personality's phrase pools into one array with per-pool offsets.
+    
+    An empty pool is packed as a single empty string so that every pool can be drawn from.
+    
+    Args:
+        personality: The personality traits
+        
+    Returns:
+        Tuple of the phrase array and the start offset and length of each pool in it
+    """
+    phrases, starts, lengths = [], [], []
+    for name in _POOL_NAMES:
+        pool = personality[name] or ("",)
+        starts.append(len(phrases))
+        lengths.append(len(pool))
+        phrases.extend(pool)
+    return np.array(phrases, dtype=object), np.array(starts), np.array(lengths)
+
+
+# Packed phrase pools per personality, so one draw picks a phrase from every pool
+_PHRASE_POOLS = MappingProxyType({
+    personality_type: _pack_phrases(personality)
+    for personality_type, personality in _PERSONALITIES.items()
+})
+
+
+# A sentence-ending period, matched with a single precompiled pattern
+_SENTENCE_END_RE = re.compile(r"\.(?=\s|$)")
+
+
+def _exclaim(text: str) -> str:
+    """Replace sentence-ending periods with exclamation marks.
+    
+    A period ends a sentence when it is followed by whitespace, including Unicode
+    whitespace such as non-breaking spaces, or the end of the text.
+    
+    Args:
+        text: The text to transform
+        
+    Returns:
+        The text with exclamation marks instead of sentence-ending periods
+    """
+    return _SENTENCE_END_RE.sub("!", text)
+
+
 class PersonalityAgent(BaseAgent):
     """
     Personality Agent that transforms responses to be more human-like.
@@ -19,54 +120,21 @@ class PersonalityAgent(BaseAgent):
     to make them more engaging and conversational.
     """
     
-    def __init__(self, name: str = "Personality", personality_type: str = "friendly"):
+    __slots__ = ("personality_type", "_rng")
+    
+    personalities = _PERSONALITIES
+    
+    def __init__(self, name: str = "Personality", personality_type: str = "friendly", seed: Optional[int] = None):
         """Initialize the Personality Agent.
         
         Args:
             name: The name of the agent
             personality_type: The type of personality to apply (friendly, professional, casual)
+            seed: Optional seed for the agent's random generator, for reproducible responses
         """
         super().__init__(name)
         self.personality_type = personality_type
-        
-        # Define personality traits and language patterns
-        self.personalities = {
-            "friendly": {
-                "greetings": ["Hi there!", "Hello!", "Hey!", "Greetings!"],
-                "closings": ["Hope that helps!", "Let me know if you need anything else!", 
-                             "I'm here if you have more questions!", "Happy to assist further!"],
-                "acknowledgments": ["I understand", "I see", "Got it", "I hear you"],
-                "transitions": ["So", "Well", "Now", "Alright"],
-                "fillers": ["actually", "you know", "basically", "essentially"],
-                "emojis": ["😊", "👍", "✨", "🙌"],
-                "emoji_frequency": 0.3,  # Probability of adding an emoji
-                "exclamation_frequency": 0.4,  # Probability of using exclamation marks
-            },
-            "professional": {
-                "greetings": ["Good day", "Greetings", "Hello", "Welcome"],
-                "closings": ["Please let me know if you require further assistance.", 
-                             "I'm available if you have additional questions.", 
-                             "Don't hesitate to reach out for more information.",
-                             "Thank you for your inquiry."],
-                "acknowledgments": ["I understand", "Noted", "I see", "Understood"],
-                "transitions": ["Therefore", "Additionally", "Furthermore", "Moreover"],
-                "fillers": ["specifically", "particularly", "notably", "indeed"],
-                "emojis": [],
-                "emoji_frequency": 0,
-                "exclamation_frequency": 0.1,
-            },
-            "casual": {
-                "greetings": ["Hey!", "What's up?", "Hi!", "Howdy!"],
-                "closings": ["Catch you later!", "Hope that works for you!", 
-                             "Let me know if you need anything!", "Take care!"],
-                "acknowledgments": ["Sure thing", "Got it", "I hear ya", "Totally"],
-                "transitions": ["So", "Anyway", "Alright", "OK"],
-                "fillers": ["like", "kinda", "pretty much", "sort of"],
-                "emojis": ["😊", "👍", "✌️", "🙂", "😉", "🤔", "💯"],
-                "emoji_frequency": 0.5,
-                "exclamation_frequency": 0.6,
-            }
-        }
+        self._rng = np.random.default_rng(seed)
     
     async def process(self, message: str, user_id: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Process a message by applying a personality layer to the response.
@@ -89,8 +157,11 @@ class PersonalityAgent(BaseAgent):
         
         source_response = context["source_agent_response"]
         
-        # Apply personality transformation
-        transformed_response = self._transform_response(source_response)
+        # Apply personality transformation, moving long responses off the event loop
+        if len(source_response) >= _OFFLOAD_MIN_LENGTH:
+            transformed_response = await asyncio.to_thread(self._transform_response, source_response)
+        else:
+            transformed_response = self._transform_response(source_response)
         
         # Record the transformation
         self.record_tool_call("personality_transform", {
@@ -114,61 +185,75 @@ class PersonalityAgent(BaseAgent):
             Transformed response string
         """
         # Get personality traits
-        personality = self.personalities.get(self.personality_type, self.personalities["friendly"])
+        personality_type = self.personality_type if self.personality_type in _PHRASE_POOLS else "friendly"
+        personality = self.personalities[personality_type]
+        phrases, starts, lengths = _PHRASE_POOLS[personality_type]
         
         # Split response into paragraphs
         paragraphs = response.split('\n\n')
         transformed_paragraphs = []
         
-        # Add a greeting to the first paragraph
-        if paragraphs:
-            greeting = random.choice(personality["greetings"])
-            paragraphs[0] = f"{greeting} {paragraphs[0]}"
+        # Draw every random decision for this response in one call: per paragraph, the
+        # transition, filler and exclamation rolls and one phrase from every pool; the
+        # first paragraph's draws also provide the greeting, closing, emoji and emoji roll
+        draws = self._rng.random((len(paragraphs), 4 + len(_POOL_NAMES)))
+        rolls = draws[:, :4].tolist()
+        picks = phrases[starts + (draws[:, 4:] * lengths).astype(np.intp)].tolist()
+        emoji_roll = rolls[0][3]
         
         # Transform each paragraph
+        is_list_item = False
         for i, paragraph in enumerate(paragraphs):
-            # Skip empty paragraphs
-            if not paragraph.strip():
-                transformed_paragraphs.append(paragraph)
-                continue
-            
-            # Add acknowledgment to the first paragraph if it's not a list item
-            if i == 0 and not paragraph.strip().startswith(('•', '-', '*', '1.')):
-                acknowledgment = random.choice(personality["acknowledgments"])
-                paragraph = f"{acknowledgment}, {paragraph[0].lower() + paragraph[1:]}"
+            transition_roll, filler_roll, exclamation_roll, _ = rolls[i]
             
-            # Add transitions to middle paragraphs
-            elif i > 0 and i < len(paragraphs) - 1 and not paragraph.strip().startswith(('•', '-', '*', '1.')):
-                if random.random() < 0.5:  # 50% chance to add a transition
-                    transition = random.choice(personality["transitions"])
-                    paragraph = f"{transition}, {paragraph[0].lower() + paragraph[1:]}"
+            if i == 0:
+                # Open the first paragraph with an acknowledgment and a greeting, built in one step;
+                # the greeting means it is never empty or a list item
+                is_list_item = False
+                greeting = picks[0][_GREETING]
+                acknowledgment = picks[0][_ACKNOWLEDGMENT]
+                paragraph = f"{acknowledgment}, {greeting[0].lower()}{greeting[1:]} {paragraph}"
+            else:
+                # Skip empty paragraphs
+                stripped = paragraph.lstrip()
+                if not stripped:
+                    is_list_item = False
+                    transformed_paragraphs.append(paragraph)
+                    continue
+                is_list_item = stripped.startswith(_LIST_ITEM_PREFIXES)
+                
+                # Add transitions to middle paragraphs
+                if i < len(paragraphs) - 1 and not is_list_item:
+                    if transition_roll < 0.5:  # 50% chance to add a transition
+                        transition = picks[i][_TRANSITION]
+                        paragraph = f"{transition}, {paragraph[0].lower()}{paragraph[1:]}"
             
             # Add fillers occasionally
-            if random.random() < 0.3 and not paragraph.strip().startswith(('•', '-', '*', '1.')):
-                filler = random.choice(personality["fillers"])
+            if filler_roll < 0.3 and not is_list_item:
+                filler = picks[i][_FILLER]
                 words = paragraph.split()
                 insert_position = min(3, len(words) - 1)
                 words.insert(insert_position, filler)
                 paragraph = ' '.join(words)
             
             # Convert periods to exclamations occasionally
-            if random.random() < personality["exclamation_frequency"]:
-                paragraph = re.sub(r'\.(?=\s|$)', '!', paragraph)
+            if exclamation_roll < personality["exclamation_frequency"]:
+                paragraph = _exclaim(paragraph)
             
             transformed_paragraphs.append(paragraph)
         
-        # Add a closing to the last paragraph if it's not a list
-        if transformed_paragraphs and not transformed_paragraphs[-1].strip().startswith(('•', '-', '*', '1.')):
-            closing = random.choice(personality["closings"])
-            transformed_paragraphs[-1] = f"{transformed_paragraphs[-1]} {closing}"
+        # Collect the closing (unless the last paragraph is a list) and an occasional emoji
+        endings = []
+        if not is_list_item:
+            endings.append(picks[0][_CLOSING])
+        if personality["emojis"] and emoji_roll < personality["emoji_frequency"]:
+            endings.append(picks[0][_EMOJI])
         
-        # Join paragraphs back together
-        transformed_response = '\n\n'.join(transformed_paragraphs)
+        # Append them to the last paragraph so the full response is only built once, by the join
+        if endings:
+            transformed_paragraphs[-1] = ' '.join([transformed_paragraphs[-1], *endings])
         
-        # Add emojis occasionally
-        if personality["emojis"] and random.random() < personality["emoji_frequency"]:
-            emoji = random.choice(personality["emojis"])
-            transformed_response = f"{transformed_response} {emoji}"
+        transformed_response = '\n\n'.join(transformed_paragraphs)
         
         return transformed_response
     
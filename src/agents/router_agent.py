@@ -4,11 +4,62 @@ Router Agent for the Agent Swarm system.
 This agent is responsible for analyzing incoming messages and routing them
 to the appropriate specialized agent based on the content.
 """
-from typing import Dict, Any, List, Optional, Type
+from __future__ import annotations
+
+from typing import Dict, Any, Optional
+import functools
 import re
 from .base_agent import BaseAgent
 
 
+# Patterns indicating a customer support query
+_SUPPORT_PATTERNS = [
+    r"(can'?t|unable to) (sign|log) in",
+    r"(can'?t|unable to) (make|do|perform) (transfer|payment)",
+    r"(problem|issue|error|trouble) with (my|the) account",
+    r"(help|support|assistance) (with|for|regarding)",
+    r"not working",
+    r"doesn'?t work"
+]
+
+# Literals every support pattern requires at least one of, used to skip the regex search
+# for messages that cannot match
+_SUPPORT_KEYWORDS = (
+    "can", "unable to", "problem", "issue", "error", "trouble",
+    "help", "support", "assistance", "not working", "doesn"
+)
+
+# The support patterns are compiled once into a single alternation
+_SUPPORT_RE = re.compile("|".join(f"(?:{p})" for p in _SUPPORT_PATTERNS))
+
+# Number of leading message characters used for routing. Routing intent is stated near the
+# start of a message, so pasted transcripts or logs after it are neither lowercased nor searched
+_ANALYZED_MESSAGE_LENGTH = 256
+
+
+def _classify(message_lower: str) -> str:
+    """Determine which agent type should handle a lowercased message.
+    
+    Args:
+        message_lower: The lowercased user message
+        
+    Returns:
+        The type of agent that should handle the message
+    """
+    # Support queries go to the support agent. General knowledge and InfinitePay questions
+    # go to the knowledge agent, which tells them apart itself
+    if any(map(message_lower.__contains__, _SUPPORT_KEYWORDS)) and _SUPPORT_RE.search(message_lower):
+        return "support"
+    
+    # Default to knowledge agent if no specific pattern is matched
+    return "knowledge"
+
+
+# Classification is deterministic, so repeated messages reuse earlier decisions; the
+# analyzed prefix length bounds the memory held by the cache
+_classify_cached = functools.lru_cache(maxsize=4096)(_classify)
+
+
 class RouterAgent(BaseAgent):
     """
     Router Agent that analyzes incoming messages and routes them to specialized agents.
@@ -17,6 +68,8 @@ class RouterAgent(BaseAgent):
     between other agents in the swarm.
     """
     
+    __slots__ = ("registered_agents",)
+    
     def __init__(self, name: str = "Router"):
         """Initialize the Router Agent.
         
@@ -35,13 +88,21 @@ class RouterAgent(BaseAgent):
         """
         self.registered_agents[agent_type] = agent
         
-    async def process(self, message: str, user_id: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def process(
+        self,
+        message: str,
+        user_id: str,
+        context: Optional[Dict[str, Any]] = None,
+        include_workflow: bool = True
+    ) -> Dict[str, Any]:
         """Process a message by analyzing it and routing to the appropriate agent.
         
         Args:
             message: The user message to process
             user_id: The ID of the user sending the message
             context: Optional context information
+            include_workflow: Whether to report each agent's tool calls; when False the
+                workflow is left empty and never built
             
         Returns:
             Dict containing the response and workflow information
@@ -50,14 +111,15 @@ class RouterAgent(BaseAgent):
         agent_type = self._analyze_message(message)
         
         # Get the appropriate agent
-        if agent_type not in self.registered_agents:
+        agent = self.registered_agents.get(agent_type)
+        if agent is None:
             return {
                 "response": "I'm unable to process this request as the required agent is not available.",
-                "agent_workflow": [{"agent_name": self.name, "tool_calls": self.get_tool_calls()}]
+                "agent_workflow": [
+                    {"agent_name": self.name, "tool_calls": self.get_tool_calls()}
+                ] if include_workflow else []
             }
         
-        agent = self.registered_agents[agent_type]
-        
         # Process the message with the selected agent
         agent_response = await agent.process(message, user_id, context)
         
@@ -65,12 +127,11 @@ class RouterAgent(BaseAgent):
         workflow = [
             {"agent_name": self.name, "tool_calls": self.get_tool_calls()},
             {"agent_name": agent.name, "tool_calls": agent.get_tool_calls()}
-        ]
+        ] if include_workflow else []
         
         # If we have a personality agent, apply it
-        if "personality" in self.registered_agents and agent_type != "personality":
-            personality_agent = self.registered_agents["personality"]
-            
+        personality_agent = self.registered_agents.get("personality")
+        if personality_agent is not None and agent_type != "personality":
             # The personality agent needs the original response
             personality_context = context or {}
             personality_context["source_agent_response"] = agent_response.get("response", "")
@@ -82,10 +143,11 @@ class RouterAgent(BaseAgent):
             )
             
             # Add personality agent to workflow
-            workflow.append({
-                "agent_name": personality_agent.name, 
-                "tool_calls": personality_agent.get_tool_calls()
-            })
+            if include_workflow:
+                workflow.append({
+                    "agent_name": personality_agent.name, 
+                    "tool_calls": personality_agent.get_tool_calls()
+                })
             
             # Return the personality-enhanced response
             return {
@@ -109,53 +171,11 @@ class RouterAgent(BaseAgent):
         Returns:
             The type of agent that should handle the message
         """
+        # Only the start of the message is analyzed (and recorded)
+        message = message[:_ANALYZED_MESSAGE_LENGTH]
+        
         # Record this tool call
-        self.record_tool_call("message_analysis", {"message": message})
+        self.record_tool_call_fast("message_analysis", "message", message)
         
         # Convert message to lowercase for easier pattern matching
-        message_lower = message.lower()
-        
-        # Check for customer support patterns
-        support_patterns = [
-            r"(can'?t|unable to) (sign|log) in",
-            r"(can'?t|unable to) (make|do|perform) (transfer|payment)",
-            r"(problem|issue|error|trouble) with (my|the) account",
-            r"(help|support|assistance) (with|for|regarding)",
-            r"not working",
-            r"doesn'?t work"
-        ]
-        
-        for pattern in support_patterns:
-            if re.search(pattern, message_lower):
-                return "support"
-        
-        # Check for general knowledge or web search patterns
-        general_knowledge_patterns = [
-            r"(what|when|where|who|how|why) (is|are|was|were|do|does|did)",
-            r"tell me about",
-            r"(news|information) (about|on|regarding)",
-            r"(latest|recent) (news|information|updates)"
-        ]
-        
-        for pattern in general_knowledge_patterns:
-            if re.search(pattern, message_lower):
-                return "knowledge"
-        
-        # Check for InfinitePay specific knowledge patterns
-        infinitepay_patterns = [
-            r"(infinitepay|infinite pay)",
-            r"(fee|cost|price|rate|charge)",
-            r"(maquininha|card machine|card reader)",
-            r"(tap to pay|contactless)",
-            r"(pix|boleto|payment|transfer)",
-            r"(conta digital|digital account)",
-            r"(emprestimo|loan)",
-            r"(cartao|card)"
-        ]
-        
-        for pattern in infinitepay_patterns:
-            if re.search(pattern, message_lower):
-                return "knowledge"
-        
-        # Default to knowledge agent if no specific pattern is matched
-        return "knowledge"
+        return _classify_cached(message.lower())
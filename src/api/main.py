@@ -4,11 +4,13 @@ FastAPI application for the Agent Swarm system.
 This module sets up the HTTP API endpoint for processing user messages
 through the Agent Swarm.
 """
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import os
 import logging
-import asyncio
 from dotenv import load_dotenv
 
 # Import agents
@@ -27,11 +29,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the knowledge base in the background while the API runs."""
+    await knowledge_agent.prewarm()
+    yield
+    await knowledge_agent.shutdown()
+
 # Create FastAPI app
 app = FastAPI(
     title="Agent Swarm API",
     description="API for processing messages through an Agent Swarm system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Request and response models
@@ -65,12 +75,13 @@ async def root():
     }
 
 @app.post("/api/message", response_model=MessageResponse)
-async def process_message(request: MessageRequest):
+async def process_message(request: MessageRequest, include_workflow: bool = True):
     """
     Process a message through the Agent Swarm.
     
     Args:
         request: MessageRequest containing the user message and user ID
+        include_workflow: Query parameter; set to false to omit the agent workflow
         
     Returns:
         MessageResponse containing the agent's response and workflow information
@@ -79,12 +90,14 @@ async def process_message(request: MessageRequest):
         logger.info(f"Received message from user {request.user_id}")
         
         # Process the message through the router agent
-        result = await router_agent.process(request.message, request.user_id)
+        result = await router_agent.process(
+            request.message, request.user_id, include_workflow=include_workflow
+        )
         
         logger.info(f"Processed message from user {request.user_id}")
         
-        # Return the response
-        return MessageResponse(
+        # Return the response; the router builds these fields itself, so skip re-validating them
+        return MessageResponse.model_construct(
             response=result.get("response", ""),
             source_agent_response=result.get("source_agent_response", ""),
             agent_workflow=result.get("agent_workflow", [])
@@ -101,4 +114,7 @@ async def health_check():
 # Run the application
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # The agents are CPU-bound between LLM calls, so scale out with worker processes
+    # (WEB_CONCURRENCY); auto-reload is only available with a single worker
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=workers == 1, workers=workers)
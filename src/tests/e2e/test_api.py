@@ -3,13 +3,8 @@ End-to-end tests for the Agent Swarm API.
 """
 import pytest
 import json
-import sys
-import os
 from fastapi.testclient import TestClient
 
-# Add the project root to the Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-
 from src.api.main import app
 
 
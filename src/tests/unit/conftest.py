@@ -0,0 +1,22 @@
+"""
+Shared fixtures for the agent unit tests.
+"""
+import pytest
+
+from src.agents.knowledge_agent import KnowledgeAgent
+from src.agents.personality_agent import PersonalityAgent
+
+
+@pytest.fixture(scope="session")
+def knowledge_agent_ro():
+    """Create a knowledge agent shared by tests that only read from it."""
+    return KnowledgeAgent(api_key="test_key")
+
+
+@pytest.fixture(scope="session")
+def personality_agents():
+    """Create one personality agent per personality type, shared by tests that only transform responses."""
+    return {
+        personality_type: PersonalityAgent(personality_type=personality_type)
+        for personality_type in PersonalityAgent.personalities
+    }
@@ -0,0 +1,62 @@
+"""
+Unit tests for the Base Agent.
+"""
+import json
+
+from src.agents.base_agent import BaseAgent
+
+
+class MockAgent(BaseAgent):
+    """Mock agent for testing."""
+
+    async def process(self, message, user_id, context=None):
+        return {"response": f"Response from {self.name}"}
+
+
+def test_tool_calls_to_json():
+    """Test that recorded tool calls serialize to JSON."""
+    agent = MockAgent("Test")
+    agent.record_tool_call("lookup", {"user_id": "user123", "count": 2})
+    
+    assert json.loads(agent.to_json()) == {"lookup": {"user_id": "user123", "count": 2}}
+
+
+def test_tool_call_history():
+    """Test that tool call history is kept per tool, deduplicated and bounded."""
+    agent = MockAgent("Test")
+    agent.TOOL_CALL_HISTORY = 3
+    agent.clear_tool_calls()
+    
+    for url in ["a", "a", "b", "c", "d"]:
+        agent.record_tool_call("web_scraping", {"url": url})
+    
+    assert agent.get_tool_calls() == {"web_scraping": {"url": "d"}}
+    assert agent.get_tool_call_history("web_scraping") == [{"url": "b"}, {"url": "c"}, {"url": "d"}]
+    assert agent.get_tool_call_history("unknown") == []
+
+
+def test_record_tool_call_fast():
+    """Test that fast-path tool calls read back as single-field dicts."""
+    agent = MockAgent("Test")
+    
+    agent.record_tool_call_fast("message_analysis", "message", "Hello")
+    agent.record_tool_call_fast("message_analysis", "message", "Goodbye")
+    
+    assert agent.get_tool_calls() == {"message_analysis": {"message": "Goodbye"}}
+    assert agent.get_tool_call_history("message_analysis") == [{"message": "Hello"}, {"message": "Goodbye"}]
+    assert json.loads(agent.to_json()) == {"message_analysis": {"message": "Goodbye"}}
+
+
+def test_record_tool_call_mixed():
+    """Test that a tool can be recorded through both the fast and the regular path."""
+    agent = MockAgent("Test")
+    
+    agent.record_tool_call_fast("message_analysis", "message", "hi")
+    agent.record_tool_call("message_analysis", {"message": "manual"})
+    agent.record_tool_call_fast("message_analysis", "message", "hello")
+    
+    assert agent.get_tool_calls() == {"message_analysis": {"message": "hello"}}
+    assert agent.get_tool_call_history("message_analysis") == [
+        {"message": "hi"}, {"message": "manual"}, {"message": "hello"}
+    ]
+    assert json.loads(agent.to_json()) == {"message_analysis": {"message": "hello"}}
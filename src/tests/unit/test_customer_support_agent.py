@@ -2,12 +2,9 @@
 Unit tests for the Customer Support Agent.
 """
 import pytest
+import time
+from datetime import datetime
 from unittest.mock import AsyncMock, patch, MagicMock
-import sys
-import os
-
-# Add the project root to the Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from src.agents.customer_support_agent import CustomerSupportAgent, AccountStatusTool, TroubleshootingTool
 
@@ -98,6 +95,14 @@ def test_account_status_tool():
     # Test that the same user gets consistent data
     status2 = tool.get_account_status("test_user")
     assert status["account_number"] == status2["account_number"]
+    
+    # Test that users sharing a template still get their own identity
+    assert tool._template_index("user_243") == tool._template_index("test_user")
+    other = tool.get_account_status("user_243")
+    assert status["user_id"] == "test_user"
+    assert other["user_id"] == "user_243"
+    assert other["account_number"] != status["account_number"]
+    assert other["balance"] == status["balance"]
 
 
 def test_troubleshooting_tool():
@@ -117,6 +122,10 @@ def test_troubleshooting_tool():
     # Test general issues
     general_result = tool.identify_issue("I have a question about something")
     assert general_result["issue_type"] == "general"
+    
+    # Test that category order decides between multiple matching issues
+    mixed_result = tool.identify_issue("My card declined and then the transfer failed")
+    assert mixed_result["issue_type"] == "transfer_issues"
 
 
 @pytest.mark.asyncio
@@ -151,3 +160,62 @@ async def test_generate_support_response():
     assert "locked" in response
     assert "Reset your password" in response
     assert "Contact support" in response
+
+
+def test_account_status_tool_eviction():
+    """Test that the account store stays bounded."""
+    tool = AccountStatusTool(max_users=2)
+    
+    first = tool.get_account_status("user_a")
+    tool.get_account_status("user_b")
+    tool.get_account_status("user_c")
+    
+    # The least recently used user is evicted
+    assert len(tool.user_data) == 2
+    assert "user_a" not in tool.user_data
+    
+    # Evicted users get the same data back on their next access
+    assert tool.get_account_status("user_a")["account_number"] == first["account_number"]
+
+
+def test_account_dates_follow_assignment_time():
+    """Test that accounts assigned later get transaction dates relative to that time."""
+    tool = AccountStatusTool()
+    start = time.time()
+    
+    recent_at_start = sum(len(tool.get_recent_transactions(f"user_{i}", 30)) for i in range(50))
+    
+    # New users a month later still get transactions from the last 30 days
+    later = start + 31 * 24 * 60 * 60
+    with (
+        patch("src.agents.customer_support_agent.time.time", return_value=later),
+        patch("src.agents.customer_support_agent.datetime") as mock_datetime
+    ):
+        mock_datetime.now.return_value = datetime.fromtimestamp(later)
+        recent_later = sum(len(tool.get_recent_transactions(f"new_user_{i}", 30)) for i in range(50))
+        account = tool.get_account_status("new_user_0")
+    
+    assert recent_at_start > 0
+    assert recent_later > 0
+    assert all(t["date_epoch"] >= later - 31 * 24 * 60 * 60 for t in account["transactions"])
+
+
+def test_recent_transactions_exclude_cutoff():
+    """Test that a transaction exactly at the cutoff is not counted as recent."""
+    tool = AccountStatusTool()
+    now = int(time.time())
+    day = 24 * 60 * 60
+    account = {
+        **tool.get_account_status("test_user"),
+        "transactions": [
+            {"id": "txn_6", "date_epoch": now - 6 * day},
+            {"id": "txn_7", "date_epoch": now - 7 * day},
+            {"id": "txn_8", "date_epoch": now - 8 * day}
+        ]
+    }
+    tool.user_data["test_user"] = (tool.user_data["test_user"][0], account)
+    
+    with patch("src.agents.customer_support_agent.time.time", return_value=now):
+        transactions = tool.get_recent_transactions("test_user", days=7)
+    
+    assert [t["id"] for t in transactions] == ["txn_6"]
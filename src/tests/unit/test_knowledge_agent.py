@@ -1,20 +1,21 @@
 """
 Unit tests for the Knowledge Agent.
 """
+import asyncio
+import faiss
+import httpx
+import numpy as np
 import pytest
+from langchain_core.documents import Document
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, patch, MagicMock
-import sys
-import os
 
-# Add the project root to the Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.agents.knowledge_agent import FastWebLoader, KnowledgeAgent
 
-from src.agents.knowledge_agent import KnowledgeAgent
 
-
-@pytest.fixture
+@pytest.fixture(scope="module")
 def mock_vectorstore():
-    """Create a mock vectorstore."""
+    """Create a mock vectorstore, shared by the module's tests since none of them call or assert on it."""
     mock = MagicMock()
     mock.as_retriever.return_value = MagicMock()
     return mock
@@ -38,17 +39,28 @@ async def test_knowledge_agent_initialization():
     assert agent.qa_chain is None
 
 
+@pytest.fixture
+def kn_patches(monkeypatch):
+    """Replace the knowledge agent's pipeline, classifier and answer methods with mocks."""
+    patches = SimpleNamespace(
+        initialize=AsyncMock(),
+        is_general=MagicMock(),
+        retrieve=AsyncMock(),
+        general=AsyncMock()
+    )
+    monkeypatch.setattr(KnowledgeAgent, "_initialize_rag_pipeline", patches.initialize)
+    monkeypatch.setattr(KnowledgeAgent, "_is_general_knowledge_question", patches.is_general)
+    monkeypatch.setattr(KnowledgeAgent, "_retrieve_and_generate", patches.retrieve)
+    monkeypatch.setattr(KnowledgeAgent, "_handle_general_knowledge", patches.general)
+    return patches
+
+
 @pytest.mark.asyncio
-@patch('src.agents.knowledge_agent.KnowledgeAgent._initialize_rag_pipeline')
-@patch('src.agents.knowledge_agent.KnowledgeAgent._is_general_knowledge_question')
-@patch('src.agents.knowledge_agent.KnowledgeAgent._retrieve_and_generate')
-async def test_knowledge_agent_process_infinitepay_query(
-    mock_retrieve, mock_is_general, mock_initialize, mock_vectorstore, mock_qa_chain
-):
+async def test_knowledge_agent_process_infinitepay_query(kn_patches, mock_vectorstore, mock_qa_chain):
     """Test that the knowledge agent processes InfinitePay queries correctly."""
     # Configure mocks
-    mock_is_general.return_value = False
-    mock_retrieve.return_value = "Response about InfinitePay"
+    kn_patches.is_general.return_value = False
+    kn_patches.retrieve.return_value = "Response about InfinitePay"
     
     # Create agent
     agent = KnowledgeAgent(api_key="test_key")
@@ -59,24 +71,19 @@ async def test_knowledge_agent_process_infinitepay_query(
     result = await agent.process("What are the fees for Maquininha Smart?", "user123")
     
     # Verify the agent processed the query correctly
-    mock_initialize.assert_not_called()  # Should not initialize since vectorstore is set
-    mock_is_general.assert_called_once()
-    mock_retrieve.assert_called_once()
+    kn_patches.initialize.assert_not_called()  # Should not initialize since vectorstore is set
+    kn_patches.is_general.assert_called_once()
+    kn_patches.retrieve.assert_called_once()
     assert result["response"] == "Response about InfinitePay"
     assert result["agent_type"] == "knowledge"
 
 
 @pytest.mark.asyncio
-@patch('src.agents.knowledge_agent.KnowledgeAgent._initialize_rag_pipeline')
-@patch('src.agents.knowledge_agent.KnowledgeAgent._is_general_knowledge_question')
-@patch('src.agents.knowledge_agent.KnowledgeAgent._handle_general_knowledge')
-async def test_knowledge_agent_process_general_query(
-    mock_general, mock_is_general, mock_initialize, mock_vectorstore, mock_qa_chain
-):
+async def test_knowledge_agent_process_general_query(kn_patches, mock_vectorstore, mock_qa_chain):
     """Test that the knowledge agent processes general knowledge queries correctly."""
     # Configure mocks
-    mock_is_general.return_value = True
-    mock_general.return_value = "Response about general knowledge"
+    kn_patches.is_general.return_value = True
+    kn_patches.general.return_value = "Response about general knowledge"
     
     # Create agent
     agent = KnowledgeAgent(api_key="test_key")
@@ -87,35 +94,33 @@ async def test_knowledge_agent_process_general_query(
     result = await agent.process("What is the weather in São Paulo?", "user123")
     
     # Verify the agent processed the query correctly
-    mock_initialize.assert_not_called()  # Should not initialize since vectorstore is set
-    mock_is_general.assert_called_once()
-    mock_general.assert_called_once()
+    kn_patches.initialize.assert_not_called()  # Should not initialize since vectorstore is set
+    kn_patches.is_general.assert_called_once()
+    kn_patches.general.assert_called_once()
     assert result["response"] == "Response about general knowledge"
     assert result["agent_type"] == "knowledge"
 
 
 @pytest.mark.asyncio
-@patch('src.agents.knowledge_agent.KnowledgeAgent._initialize_rag_pipeline')
-async def test_knowledge_agent_initialize_if_needed(mock_initialize, mock_vectorstore, mock_qa_chain):
+async def test_knowledge_agent_initialize_if_needed(kn_patches):
     """Test that the knowledge agent initializes the RAG pipeline if needed."""
     # Create agent with no vectorstore
     agent = KnowledgeAgent(api_key="test_key")
     
     # Configure mocks for the rest of the process
-    mock_initialize.return_value = None
-    agent._is_general_knowledge_question = MagicMock(return_value=False)
-    agent._retrieve_and_generate = AsyncMock(return_value="Test response")
+    kn_patches.is_general.return_value = False
+    kn_patches.retrieve.return_value = "Test response"
     
     # Process a query
     await agent.process("What are the fees for Maquininha Smart?", "user123")
     
     # Verify the agent initialized the RAG pipeline
-    mock_initialize.assert_called_once()
+    kn_patches.initialize.assert_called_once()
 
 
-def test_is_general_knowledge_question():
+def test_is_general_knowledge_question(knowledge_agent_ro):
     """Test the general knowledge question detection."""
-    agent = KnowledgeAgent(api_key="test_key")
+    agent = knowledge_agent_ro
     
     # InfinitePay-related queries should return False
     assert not agent._is_general_knowledge_question("What are the fees for Maquininha?")
@@ -126,3 +131,189 @@ def test_is_general_knowledge_question():
     assert agent._is_general_knowledge_question("What's the latest news about technology?")
     assert agent._is_general_knowledge_question("Tell me about the weather in Brazil")
     assert agent._is_general_knowledge_question("What's happening in sports today?")
+
+
+@pytest.mark.asyncio
+@patch('src.agents.knowledge_agent.FastWebLoader')
+async def test_load_url_handles_errors(mock_loader):
+    """Test that a failing URL load is recorded and reported as a failure."""
+    mock_loader.return_value.aload = AsyncMock(side_effect=Exception("connection refused"))
+    agent = KnowledgeAgent(api_key="test_key")
+    
+    docs = await agent._load_url("https://www.infinitepay.io", asyncio.Semaphore(1), MagicMock())
+    
+    assert docs is None
+    assert agent.get_tool_calls()["web_scraping"]["status"] == "error"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failed_urls, saved", [(0, True), (1, False)])
+async def test_partial_scrape_is_not_persisted(failed_urls, saved):
+    """Test that the vectorstore is only persisted when every URL loaded."""
+    agent = KnowledgeAgent(api_key="test_key")
+    agent.infinitepay_urls = agent.infinitepay_urls[:3]
+    page = [Document(page_content="Maquininha Smart", metadata={"source": "test"})]
+    results = [None] * failed_urls + [page] * (len(agent.infinitepay_urls) - failed_urls)
+    
+    with (
+        patch("langchain_openai.OpenAIEmbeddings"),
+        patch("langchain_openai.ChatOpenAI"),
+        patch("langchain.chains.RetrievalQA"),
+        patch.object(agent, "_load_cached_vectorstore", return_value=None),
+        patch.object(agent, "_load_url", AsyncMock(side_effect=results)),
+        patch.object(agent, "_embed_texts", AsyncMock(return_value=[[0.0]])),
+        patch.object(agent, "_build_vectorstore", return_value=MagicMock()),
+        patch.object(agent, "_save_cached_vectorstore") as mock_save
+    ):
+        await agent._initialize_rag_pipeline()
+    
+    assert mock_save.called is saved
+
+
+def test_cache_path_depends_on_sources(tmp_path):
+    """Test that the vectorstore cache is keyed by the source URLs."""
+    agent = KnowledgeAgent(api_key="test_key")
+    agent.cache_dir = str(tmp_path)
+    path = agent._cache_path()
+    assert path.startswith(str(tmp_path))
+    assert agent._cache_path() == path
+    
+    agent.infinitepay_urls = agent.infinitepay_urls[:1]
+    assert agent._cache_path() != path
+
+
+def test_load_cached_vectorstore_miss(tmp_path):
+    """Test that a missing cache returns None instead of raising."""
+    agent = KnowledgeAgent(api_key="test_key")
+    agent.cache_dir = str(tmp_path)
+    assert agent._load_cached_vectorstore(MagicMock()) is None
+
+
+@pytest.mark.asyncio
+async def test_retrieve_and_generate_caches_answers(mock_qa_chain):
+    """Test that repeated RAG queries are answered from the cache."""
+    agent = KnowledgeAgent(api_key="test_key")
+    agent.qa_chain = mock_qa_chain
+    
+    first = await agent._retrieve_and_generate("What is the Maquininha?")
+    second = await agent._retrieve_and_generate("  what is the  maquininha? ")
+    
+    assert first == second == "This is a test response about InfinitePay."
+    mock_qa_chain.invoke.assert_called_once()
+    assert agent.get_tool_calls()["rag_answer_cache"]["status"] == "hit"
+
+
+@pytest.mark.asyncio
+async def test_embed_texts_batches_in_order():
+    """Test that texts are embedded in batches and returned in input order."""
+    agent = KnowledgeAgent(api_key="test_key")
+    agent.embedding_batch_size = 2
+    embeddings = MagicMock()
+    embeddings.embed_documents.side_effect = lambda batch: [[float(len(text))] for text in batch]
+    
+    vectors = await agent._embed_texts(embeddings, ["a", "bb", "ccc", "dddd", "eeeee"])
+    
+    assert vectors == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert embeddings.embed_documents.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_fast_web_loader():
+    """Test that the web loader extracts the visible page text."""
+    html = (
+        "<html><head><title>Maquininha</title><script>var x = 1;</script></head>"
+        "<body><h1>Maquininha Smart</h1><p>Low fees</p></body></html>"
+    )
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text=html))
+    async with httpx.AsyncClient(transport=transport) as client:
+        docs = await FastWebLoader("https://www.infinitepay.io/maquininha").aload(client)
+    
+    assert len(docs) == 1
+    assert docs[0].page_content == "Maquininha Smart\nLow fees"
+    assert docs[0].metadata == {"source": "https://www.infinitepay.io/maquininha", "title": "Maquininha"}
+
+
+def test_build_vectorstore_index_type():
+    """Test that large corpora get a compressed IVF-PQ index and small ones a flat index."""
+    agent = KnowledgeAgent(api_key="test_key")
+    agent.ivfpq_min_vectors = 300
+    agent.ivfpq_nlist = 4
+    agent.ivfpq_m = 4
+    
+    vectors = np.random.default_rng(0).random((300, 16)).tolist()
+    texts = [f"chunk {i}" for i in range(300)]
+    metadatas = [{"source": "test"} for _ in range(300)]
+    
+    small = agent._build_vectorstore(MagicMock(), texts[:10], vectors[:10], metadatas[:10])
+    assert isinstance(small.index, faiss.IndexFlat)
+    
+    large = agent._build_vectorstore(MagicMock(), texts, vectors, metadatas)
+    assert isinstance(large.index, faiss.IndexIVFPQ)
+    assert large.index.ntotal == 300
+    assert large.similarity_search_by_vector(vectors[0], k=1)
+
+
+@pytest.mark.asyncio
+@patch('src.agents.knowledge_agent.KnowledgeAgent._initialize_rag_pipeline')
+async def test_prewarm_shares_initialization(mock_initialize):
+    """Test that a prewarmed pipeline is not initialized again by the first query."""
+    agent = KnowledgeAgent(api_key="test_key")
+    agent._is_general_knowledge_question = MagicMock(return_value=False)
+    agent._retrieve_and_generate = AsyncMock(return_value="Test response")
+    
+    await agent.prewarm()
+    await agent.process("What are the fees for Maquininha Smart?", "user123")
+    
+    mock_initialize.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_query_keeps_initialization():
+    """Test that cancelling a waiting query does not cancel the shared initialization."""
+    agent = KnowledgeAgent(api_key="test_key")
+    agent._is_general_knowledge_question = MagicMock(return_value=False)
+    agent._retrieve_and_generate = AsyncMock(return_value="Test response")
+    
+    async def initialize():
+        await asyncio.sleep(0.05)
+        agent.vectorstore = MagicMock()
+    
+    with patch.object(KnowledgeAgent, "_initialize_rag_pipeline", side_effect=initialize) as mock_initialize:
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(agent.process("What are the fees?", "user123"), timeout=0.01)
+        result = await agent.process("What are the fees?", "user123")
+    
+    assert result["response"] == "Test response"
+    mock_initialize.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch('src.agents.knowledge_agent.KnowledgeAgent._initialize_rag_pipeline')
+async def test_failed_prewarm_is_retried(mock_initialize):
+    """Test that the first query after a failed prewarm starts a new initialization."""
+    mock_initialize.side_effect = [RuntimeError("scraping failed"), None]
+    agent = KnowledgeAgent(api_key="test_key")
+    agent._is_general_knowledge_question = MagicMock(return_value=False)
+    agent._retrieve_and_generate = AsyncMock(return_value="Test response")
+    
+    await agent.prewarm()
+    await asyncio.wait([agent._init_task])
+    result = await agent.process("What are the fees?", "user123")
+    
+    assert result["response"] == "Test response"
+    assert mock_initialize.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_shutdown_cancels_prewarm():
+    """Test that shutting down cancels a running background initialization."""
+    agent = KnowledgeAgent(api_key="test_key")
+    
+    async def initialize():
+        await asyncio.sleep(10)
+    
+    with patch.object(KnowledgeAgent, "_initialize_rag_pipeline", side_effect=initialize):
+        await agent.prewarm()
+        await agent.shutdown()
+    
+    assert agent._init_task.cancelled()
@@ -1,15 +1,11 @@
 """
 Unit tests for the Personality Agent.
 """
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
-import sys
-import os
 
-# Add the project root to the Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-
-from src.agents.personality_agent import PersonalityAgent
+from src.agents.personality_agent import PersonalityAgent, _exclaim
 
 
 @pytest.mark.asyncio
@@ -54,9 +50,9 @@ async def test_personality_agent_process_without_source():
 
 
 @pytest.mark.asyncio
-async def test_personality_agent_transform_response():
+async def test_personality_agent_transform_response(personality_agents):
     """Test the response transformation logic."""
-    agent = PersonalityAgent()
+    agent = personality_agents["friendly"]
     
     # Test with a simple response
     original = "This is a test response."
@@ -74,20 +70,29 @@ async def test_personality_agent_transform_response():
     assert len(transformed.split("\n\n")) == 2
 
 
-@pytest.mark.asyncio
-async def test_personality_agent_different_personalities():
-    """Test different personality types."""
-    # Test friendly personality
-    friendly_agent = PersonalityAgent(personality_type="friendly")
-    friendly_result = friendly_agent._transform_response("This is a test.")
-    
-    # Test professional personality
-    professional_agent = PersonalityAgent(personality_type="professional")
-    professional_result = professional_agent._transform_response("This is a test.")
+@pytest.fixture(scope="session")
+def transformed_by_personality(personality_agents):
+    """Transform the same response once with each personality type."""
+    return {
+        personality_type: agent._transform_response("This is a test.")
+        for personality_type, agent in personality_agents.items()
+    }
+
+
+@pytest.mark.parametrize("personality_type", ["friendly", "professional", "casual"])
+def test_personality_transforms(personality_type, transformed_by_personality):
+    """Test that each personality type transforms the response."""
+    transformed = transformed_by_personality[personality_type]
     
-    # Test casual personality
-    casual_agent = PersonalityAgent(personality_type="casual")
-    casual_result = casual_agent._transform_response("This is a test.")
+    assert "is a test" in transformed
+    assert len(transformed) > len("This is a test.")
+
+
+def test_personalities_differ(transformed_by_personality):
+    """Test different personality types."""
+    friendly_result = transformed_by_personality["friendly"]
+    professional_result = transformed_by_personality["professional"]
+    casual_result = transformed_by_personality["casual"]
     
     # Verify each personality produces different results
     assert friendly_result != professional_result
@@ -95,6 +100,30 @@ async def test_personality_agent_different_personalities():
     assert professional_result != casual_result
 
 
+@pytest.mark.asyncio
+async def test_personality_agent_process_long_response():
+    """Test that long responses are transformed off the event loop with the same result shape."""
+    agent = PersonalityAgent()
+    source = "\n\n".join(["This is a long paragraph of text."] * 100)
+    
+    with patch("src.agents.personality_agent.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+        result = await agent.process("Original message", "user123", {"source_agent_response": source})
+    
+    to_thread.assert_called_once()
+    assert len(result["response"].split("\n\n")) == 100
+
+
+def test_transform_response_seed():
+    """Test that seeded agents produce reproducible responses."""
+    response = "This is paragraph one.\n\nThis is paragraph two.\n\nThis is paragraph three."
+    
+    first = PersonalityAgent(seed=42)
+    second = PersonalityAgent(seed=42)
+    
+    for _ in range(5):
+        assert first._transform_response(response) == second._transform_response(response)
+
+
 def test_set_personality():
     """Test setting the personality type."""
     agent = PersonalityAgent()
@@ -106,3 +135,20 @@ def test_set_personality():
     # Test setting an invalid personality
     agent.set_personality("invalid_type")
     assert agent.personality_type == "professional"  # Should not change
+
+
+def test_exclaim():
+    """Test that only sentence-ending periods become exclamation marks."""
+    assert _exclaim("Fees are 1.5% today. Great.") == "Fees are 1.5% today! Great!"
+    assert _exclaim("One.\nTwo.") == "One!\nTwo!"
+    assert _exclaim("Visit infinitepay.io") == "Visit infinitepay.io"
+    assert _exclaim("Done.\xa0Next.\fLast.\vEnd") == "Done!\xa0Next!\fLast!\vEnd"
+
+
+def test_transform_response_leaves_list_items(personality_agents):
+    """Test that list items do not get conversational additions."""
+    agent = personality_agents["professional"]
+    
+    transformed = agent._transform_response("Here are the steps.\n\n- Open the app\n\n- Tap Pix")
+    
+    assert transformed.split("\n\n")[1:] == ["- Open the app", "- Tap Pix"]
@@ -3,11 +3,6 @@ Unit tests for the Router Agent.
 """
 import pytest
 from unittest.mock import AsyncMock, patch
-import sys
-import os
-
-# Add the project root to the Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from src.agents.router_agent import RouterAgent
 from src.agents.base_agent import BaseAgent
@@ -114,6 +109,24 @@ async def test_router_agent_personality_application():
     assert "Personality" in agent_names
 
 
+@pytest.mark.asyncio
+async def test_router_agent_without_workflow():
+    """Test that the workflow can be left out of the result."""
+    router = RouterAgent()
+    knowledge_agent = MockAgent("Knowledge")
+    personality_agent = MockAgent("Personality")
+    knowledge_agent.process = AsyncMock(return_value={"response": f"Response from {knowledge_agent.name}"})
+    personality_agent.process = AsyncMock(return_value={"response": f"Response from {personality_agent.name}"})
+    
+    router.register_agent("knowledge", knowledge_agent)
+    router.register_agent("personality", personality_agent)
+    
+    result = await router.process("Tell me about the Maquininha", "user123", include_workflow=False)
+    
+    assert result["response"] == "Response from Personality"
+    assert result["agent_workflow"] == []
+
+
 @pytest.mark.asyncio
 async def test_router_agent_missing_agent():
     """Test that the router handles missing agents gracefully."""
@@ -129,3 +142,19 @@ async def test_router_agent_missing_agent():
     agent_names = [step["agent_name"] for step in result["agent_workflow"]]
     assert len(agent_names) == 1
     assert "Router" in agent_names
+
+
+def test_analyze_message():
+    """Test the message classification patterns."""
+    router = RouterAgent()
+    
+    assert router._analyze_message("I'm unable to log in") == "support"
+    assert router._analyze_message("There is a problem with my account") == "support"
+    assert router._analyze_message("The app doesn't work") == "support"
+    assert router._analyze_message("Tell me about the Maquininha") == "knowledge"
+    assert router._analyze_message("Hello") == "knowledge"
+    
+    # Only the start of long messages is analyzed
+    assert router._analyze_message("I can't log in. " + "Log output " * 100) == "support"
+    assert router._analyze_message("Log output " * 100 + "I can't log in.") == "knowledge"
+    assert router.get_tool_calls() == {"message_analysis": {"message": ("Log output " * 100)[:256]}}